@@ -10,10 +10,52 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-if __name__ == "__main__":
-    uvicorn.run(
+def run_granian(host: str, port: int, workers: int):
+    """Serve the app with Granian (optional, `pip install granian`)"""
+    from granian import Granian
+    from granian.constants import Interfaces, Loops
+
+    Granian(
         "src.main:app",
-        host=os.getenv("HOST", "0.0.0.0"),
-        port=int(os.getenv("PORT", 8000)),
-        reload=os.getenv("DEBUG", "True").lower() == "true"
-    ) 
\ No newline at end of file
+        address=host,
+        port=port,
+        interface=Interfaces.ASGI,
+        workers=workers,
+        loop=Loops.uvloop,
+        backlog=2048
+    ).serve()
+
+if __name__ == "__main__":
+    debug = os.getenv("DEBUG", "True").lower() == "true"
+    host = os.getenv("HOST", "0.0.0.0")
+    port = int(os.getenv("PORT", 8000))
+    workers = int(os.getenv("WEB_CONCURRENCY", 1))
+    
+    # The embedded Chroma client keeps its HNSW index in each process, so
+    # workers would not see each other's uploads. Only scale out against a
+    # shared Chroma server (CHROMA_HOST); the caches are shared through Redis.
+    if workers > 1 and not os.getenv("CHROMA_HOST"):
+        print(f"WEB_CONCURRENCY={workers} needs a shared Chroma server (CHROMA_HOST); starting 1 worker")
+        workers = 1
+
+    if debug:
+        uvicorn.run(
+            "src.main:app",
+            host=host,
+            port=port,
+            reload=True
+        )
+    elif os.getenv("SERVER", "uvicorn").lower() == "granian":
+        run_granian(host, port, workers)
+    else:
+        # Production: uvloop + httptools. Each worker process has its own
+        # EmbeddingGenerator and Chroma client, and in-memory cache tiers.
+        uvicorn.run(
+            "src.main:app",
+            host=host,
+            port=port,
+            workers=workers,
+            loop="uvloop",
+            http="httptools",
+            access_log=False
+        )
@@ -1,10 +1,16 @@
 import os
 import jwt
+import time
+import hashlib
+import threading
+from cachetools import TTLCache
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, FrozenSet
 from fastapi import HTTPException, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
+from starlette.types import ASGIApp, Receive, Scope, Send
+from pydantic import BaseModel, ConfigDict
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,14 +19,26 @@ load_dotenv()
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = int(os.getenv("JWT_EXPIRATION_HOURS", "24"))
+JWT_CACHE_TTL = int(os.getenv("JWT_CACHE_TTL", "5"))
+
+# Verified tokens, keyed by SHA-256 of the raw token -> (TokenData, exp)
+_token_cache = TTLCache(maxsize=10000, ttl=JWT_CACHE_TTL)
+_token_cache_lock = threading.Lock()
 
 # Security scheme
-security = HTTPBearer()
+security = HTTPBearer(auto_error=False)
 
 class TokenData(BaseModel):
+    # Instances are shared between requests through the token cache
+    model_config = ConfigDict(frozen=True)
+    
     user_id: str
     role: str
-    permissions: List[str]
+    permissions: FrozenSet[str]
+
+# Per-request authentication state, populated once by AuthMiddleware
+current_user_var: ContextVar[Optional[TokenData]] = ContextVar("current_user", default=None)
+_auth_error_var: ContextVar[Optional[HTTPException]] = ContextVar("auth_error", default=None)
 
 class UserRole:
     ADMIN = "admin"
@@ -34,14 +52,15 @@ class Permission:
 
 # Role-based permissions mapping
 ROLE_PERMISSIONS = {
-    UserRole.ADMIN: [Permission.UPLOAD, Permission.ANALYTICS, Permission.POPULAR],
-    UserRole.ANALYTICS: [Permission.ANALYTICS, Permission.POPULAR],
-    UserRole.USER: []  # Basic user permissions (search, document access, etc.)
+    UserRole.ADMIN: frozenset({Permission.UPLOAD, Permission.ANALYTICS, Permission.POPULAR}),
+    UserRole.ANALYTICS: frozenset({Permission.ANALYTICS, Permission.POPULAR}),
+    UserRole.USER: frozenset()  # Basic user permissions (search, document access, etc.)
 }
 
 def create_access_token(user_id: str, role: str) -> str:
     """Create a JWT access token"""
-    permissions = ROLE_PERMISSIONS.get(role, [])
+    # JWT payloads are JSON, so serialize the permission set as a list
+    permissions = sorted(ROLE_PERMISSIONS.get(role, frozenset()))
     
     payload = {
         "user_id": user_id,
@@ -54,7 +73,17 @@ def create_access_token(user_id: str, role: str) -> str:
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 def verify_token(token: str) -> TokenData:
-    """Verify and decode JWT token"""
+    """Verify and decode JWT token, reusing recent successful verifications"""
+    key = hashlib.sha256(token.encode()).digest()
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    
+    if cached is not None:
+        token_data, exp = cached
+        # Never serve a cached entry past the token's own expiry
+        if exp > time.time():
+            return token_data
+    
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
         
@@ -68,11 +97,17 @@ def verify_token(token: str) -> TokenData:
                 detail="Invalid token payload"
             )
         
-        return TokenData(
+        token_data = TokenData(
             user_id=user_id,
             role=role,
-            permissions=permissions
+            permissions=frozenset(permissions)
         )
+        
+        # Only successful verifications are cached
+        with _token_cache_lock:
+            _token_cache[key] = (token_data, payload.get("exp", float("inf")))
+        
+        return token_data
     
     except jwt.ExpiredSignatureError:
         raise HTTPException(
@@ -85,14 +120,66 @@ def verify_token(token: str) -> TokenData:
             detail="Invalid token"
         )
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenData:
-    """Get current user from JWT token"""
-    token = credentials.credentials
-    return verify_token(token)
+class AuthMiddleware:
+    """
+    Verify the bearer token once per request and expose it via current_user_var.
+    Plain ASGI middleware: unlike BaseHTTPMiddleware it does not wrap the
+    response stream or hold the connection while background tasks run.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        user = None
+        error = None
+        
+        authorization = next((value for name, value in scope["headers"] if name == b"authorization"), b"")
+        scheme, _, token = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                user = verify_token(token)
+            except HTTPException as e:
+                # Public routes must still work, so only protected routes raise this
+                error = e
+        
+        user_reset = current_user_var.set(user)
+        error_reset = _auth_error_var.set(error)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_user_var.reset(user_reset)
+            _auth_error_var.reset(error_reset)
+
+async def get_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> TokenData:
+    """Get current user verified by AuthMiddleware"""
+    # HTTPBearer is kept for the OpenAPI security scheme; the token itself
+    # has already been decoded by the middleware
+    error = _auth_error_var.get()
+    if error is not None:
+        raise error
+    
+    current_user = current_user_var.get()
+    if current_user is not None:
+        return current_user
+    
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing bearer token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    
+    # Middleware not installed - verify directly
+    return verify_token(credentials.credentials)
 
 def require_permission(required_permission: str):
     """Decorator to require specific permission"""
-    def permission_checker(current_user: TokenData = Depends(get_current_user)) -> TokenData:
+    async def permission_checker(current_user: TokenData = Depends(get_current_user)) -> TokenData:
         if required_permission not in current_user.permissions:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -104,7 +191,7 @@ def require_permission(required_permission: str):
 
 def require_role(required_role: str):
     """Decorator to require specific role"""
-    def role_checker(current_user: TokenData = Depends(get_current_user)) -> TokenData:
+    async def role_checker(current_user: TokenData = Depends(get_current_user)) -> TokenData:
         if current_user.role != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
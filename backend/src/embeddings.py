@@ -1,50 +1,153 @@
 import os
+import asyncio
+import hashlib
+import logging
+import functools
 import openai
-from typing import List
+import redis
+from typing import List, Dict, Optional
 import numpy as np
+from cachetools import LRUCache
 from dotenv import load_dotenv
 
+try:
+    from .usage_tracker import redis_async_client
+except ImportError:
+    from usage_tracker import redis_async_client
+
 load_dotenv()
 
+logger = logging.getLogger("research_assistant.embeddings")
+
+# Seconds a query embedding is shared across workers through Redis
+EMBEDDING_CACHE_TTL = int(os.getenv("EMBEDDING_CACHE_TTL", "3600"))
+
 class EmbeddingGenerator:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = os.getenv("OPENAI_MODEL", "text-embedding-ada-002")
+        # OpenAI text-embedding-ada-002 has 1536 dimensions; other models are
+        # probed once on first use
+        self._dim: Optional[int] = 1536 if self.model == "text-embedding-ada-002" else None
+        # In-flight embedding lookups keyed by text, shared by concurrent callers
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Query embeddings only depend on the text and model, so they are
+        # cached in-process and in Redis regardless of collection changes
+        self._embedding_cache = LRUCache(maxsize=int(os.getenv("EMBEDDING_CACHE_SIZE", "4096")))
+        # Large batches are split into sub-batches sent concurrently, capped
+        # to stay clear of OpenAI rate limits
+        self.batch_size = int(os.getenv("EMBEDDING_BATCH_SIZE", "96"))
+        self._batch_semaphore = asyncio.Semaphore(int(os.getenv("EMBEDDING_CONCURRENCY", "8")))
+    
+    async def generate_embedding(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text using OpenAI API,
+        as a float32 array of shape (dim,).
+        Results are cached in memory and in Redis; concurrent calls for the
+        same text share a single API request.
+        """
+        embedding = self._embedding_cache.get(text)
+        if embedding is not None:
+            return embedding
+        
+        task = self._inflight.get(text)
+        if task is None:
+            # The lookup runs in its own task, so cancelling one caller (e.g.
+            # a disconnected client) doesn't cancel it for the others waiting
+            task = asyncio.create_task(self._fetch_embedding(text))
+            self._inflight[text] = task
+            task.add_done_callback(functools.partial(self._finish_inflight, text))
+        
+        return await asyncio.shield(task)
+    
+    async def _fetch_embedding(self, text: str) -> np.ndarray:
+        """
+        Shared Redis cache first, then the API; the result is kept in memory
+        """
+        embedding = await self._get_shared_embedding(text)
+        if embedding is None:
+            embedding = await self._create_embedding(text)
+            await self._set_shared_embedding(text, embedding)
+        self._embedding_cache[text] = embedding
+        return embedding
+    
+    def _finish_inflight(self, text: str, task: asyncio.Task):
+        if self._inflight.get(text) is task:
+            del self._inflight[text]
+        # Mark the exception as retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+    
+    def _shared_cache_key(self, text: str) -> str:
+        return f"qemb:{self.model}:" + hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
     
-    def generate_embedding(self, text: str) -> List[float]:
+    async def _get_shared_embedding(self, text: str) -> Optional[np.ndarray]:
         """
-        Generate embedding for a single text using OpenAI API
+        Look up an embedding stored as float32 bytes in Redis
         """
         try:
-            response = self.client.embeddings.create(
+            cached = await redis_async_client.get(self._shared_cache_key(text))
+        except redis.RedisError as e:
+            # The cache is an optimization; fall back to the API
+            logger.warning("Embedding cache lookup failed: %s", e)
+            return None
+        return np.frombuffer(cached, dtype=np.float32) if cached else None
+    
+    async def _set_shared_embedding(self, text: str, embedding: np.ndarray):
+        """
+        Store an embedding as float32 bytes in Redis
+        """
+        try:
+            await redis_async_client.setex(self._shared_cache_key(text), EMBEDDING_CACHE_TTL, embedding.tobytes())
+        except redis.RedisError as e:
+            logger.warning("Embedding cache store failed: %s", e)
+    
+    async def _create_embedding(self, text: str) -> np.ndarray:
+        """
+        OpenAI call for a single text
+        """
+        try:
+            response = await self.client.embeddings.create(
                 model=self.model,
                 input=text
             )
-            return response.data[0].embedding
+            return np.asarray(response.data[0].embedding, dtype=np.float32)
         except Exception as e:
             raise Exception(f"Error generating embedding: {str(e)}")
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
         """
-        Generate embeddings for multiple texts using OpenAI API
+        Generate embeddings for multiple texts using OpenAI API,
+        as a float32 array of shape (len(texts), dim).
+        Texts are split into sub-batches which are embedded concurrently.
         """
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=texts
+            sub_batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            responses = await asyncio.gather(*[self._create_embeddings(sub) for sub in sub_batches])
+            # gather preserves sub-batch order, so embeddings line up with texts
+            return np.array(
+                [data.embedding for response in responses for data in response.data],
+                dtype=np.float32
             )
-            return [data.embedding for data in response.data]
         except Exception as e:
             raise Exception(f"Error generating embeddings batch: {str(e)}")
     
-    def get_embedding_dimension(self) -> int:
+    async def _create_embeddings(self, texts: List[str]):
+        """
+        OpenAI call for one sub-batch, limited by the batch semaphore
+        """
+        async with self._batch_semaphore:
+            return await self.client.embeddings.create(
+                model=self.model,
+                input=texts
+            )
+    
+    async def get_embedding_dimension(self) -> int:
         """
         Get the dimension of embeddings for the current model
         """
-        # OpenAI text-embedding-ada-002 has 1536 dimensions
-        if self.model == "text-embedding-ada-002":
-            return 1536
-        else:
+        if self._dim is None:
             # For other models, we'll need to generate a test embedding
-            test_embedding = self.generate_embedding("test")
-            return len(test_embedding) 
\ No newline at end of file
+            test_embedding = await self._create_embedding("test")
+            self._dim = len(test_embedding)
+        return self._dim 
\ No newline at end of file
@@ -1,14 +1,30 @@
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import os
-import requests
-import json
+import re
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import hashlib
+import redis
+import tiktoken
+import asyncio
+import httpx
+import aiofiles
+import ijson
+import orjson
 import tempfile
+import numpy as np
 from pathlib import Path
 from dotenv import load_dotenv
-from typing import List
-from openai import OpenAI
+from typing import AsyncIterator, List, Optional
+from pydantic import TypeAdapter
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.decorator import cache
+from fastapi_cache.coder import Coder
+from openai import AsyncOpenAI
 from datetime import datetime
 
 try:
@@ -16,41 +32,59 @@ try:
         UploadRequest, UploadResponse, SimilaritySearchRequest, 
         SimilaritySearchResponse, JournalDocument, ErrorResponse,
         CompareRequest, CompareResponse, PaperSummary,
-        TokenRequest, TokenResponse
+        TokenRequest, TokenResponse, JournalChunk
     )
     from .embeddings import EmbeddingGenerator
     from .vector_store import ChromaVectorStore
-    from .usage_tracker import RedisUsageTracker
+    from .usage_tracker import RedisUsageTracker, redis_client, redis_async_client
+    from .query_cache import SemanticQueryCache
     from .auth import (
         require_upload_permission, require_analytics_permission, 
         require_popular_permission, create_access_token, 
-        TokenData, UserRole, ROLE_PERMISSIONS, JWT_EXPIRATION_HOURS
+        TokenData, UserRole, ROLE_PERMISSIONS, JWT_EXPIRATION_HOURS,
+        AuthMiddleware
     )
 except ImportError:
     from models import (
         UploadRequest, UploadResponse, SimilaritySearchRequest, 
         SimilaritySearchResponse, JournalDocument, ErrorResponse,
         CompareRequest, CompareResponse, PaperSummary,
-        TokenRequest, TokenResponse
+        TokenRequest, TokenResponse, JournalChunk
     )
     from embeddings import EmbeddingGenerator
     from vector_store import ChromaVectorStore
-    from usage_tracker import RedisUsageTracker
+    from usage_tracker import RedisUsageTracker, redis_client, redis_async_client
+    from query_cache import SemanticQueryCache
     from auth import (
         require_upload_permission, require_analytics_permission, 
         require_popular_permission, create_access_token, 
-        TokenData, UserRole, ROLE_PERMISSIONS, JWT_EXPIRATION_HOURS
+        TokenData, UserRole, ROLE_PERMISSIONS, JWT_EXPIRATION_HOURS,
+        AuthMiddleware
     )
 
 load_dotenv()
 
+# Logging: records are queued and written by a listener thread, so handler
+# I/O never blocks the event loop. Modules log under "research_assistant.*".
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+log_listener = QueueListener(log_queue, log_handler)
+
+logger = logging.getLogger("research_assistant")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logger.addHandler(QueueHandler(log_queue))
+logger.propagate = False
+log_listener.start()
+
 # Configure OpenAI client
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 app = FastAPI(
     title="Research Assistant API",
     description="AI-powered research assistant for scientific journal publishers",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -63,10 +97,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Decode the bearer token once per request for all permission checks
+app.add_middleware(AuthMiddleware)
+
 # Initialize services
 embedding_generator = EmbeddingGenerator()
 vector_store = ChromaVectorStore()
 usage_tracker = RedisUsageTracker()
+query_cache = SemanticQueryCache()
+# Kept in Redis so every worker sees the same cached documents
+FastAPICache.init(RedisBackend(redis_async_client), prefix="research-assistant")
+
+# Bumped after every upload, by whichever worker ran it. Search and document
+# cache keys include it, so nothing cached before an upload is served after it.
+COLLECTION_VERSION_KEY = f"collection_version:{vector_store.collection_name}"
+
+async def get_collection_version() -> Optional[int]:
+    """Current collection version, or None if Redis can't be reached"""
+    try:
+        return int(await redis_async_client.get(COLLECTION_VERSION_KEY) or 0)
+    except redis.RedisError:
+        logger.warning("Redis unavailable, serving uncached reads")
+        return None
+
+async def bump_collection_version():
+    try:
+        await redis_async_client.incr(COLLECTION_VERSION_KEY)
+    except redis.RedisError:
+        # Cache entries expire on their own; until then they may be stale
+        logger.exception("Failed to bump collection version after an upload")
+
+def track_usage(usages: List[tuple]):
+    """Record usage for (chunk_id, source_doc_id) pairs; reads still succeed if Redis is down"""
+    try:
+        usage_tracker.update_usage_many(usages)
+    except redis.RedisError:
+        logger.warning("Redis unavailable, usage of %d chunks not recorded", len(usages))
+
+class ORJSONCoder(Coder):
+    """fastapi-cache coder using orjson instead of the stdlib json module"""
+    
+    @classmethod
+    def encode(cls, value) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY)
+    
+    @classmethod
+    def decode(cls, value: bytes):
+        return orjson.loads(value)
+
+# Chunks per batch when parsing upload files and inserting into Chroma
+STORE_BATCH_SIZE = int(os.getenv("UPLOAD_STORE_BATCH_SIZE", "256"))
+
+# Upload background tasks (embedding + storage) allowed to run at once
+UPLOAD_SEMAPHORE = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_UPLOADS", "4")))
+
+# Shared HTTP client for URL uploads, reusing connections across downloads.
+# HTTP/2 multiplexes concurrent Drive downloads over one connection.
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+    http2=True,
+    timeout=30,
+    follow_redirects=True
+)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close pooled download connections"""
+    await http_client.aclose()
+
+@app.on_event("shutdown")
+def stop_log_listener():
+    """Flush queued log records"""
+    log_listener.stop()
+
+# Bulk (de)serializer for chunk lists handed to background processing
+chunk_list_adapter = TypeAdapter(List[JournalChunk])
 
 @app.get("/")
 async def root():
@@ -95,7 +200,7 @@ async def create_token(request: TokenRequest):
         
         # Generate token
         access_token = create_access_token(request.user_id, request.role)
-        permissions = ROLE_PERMISSIONS.get(request.role, [])
+        permissions = sorted(ROLE_PERMISSIONS.get(request.role, frozenset()))
         
         return TokenResponse(
             access_token=access_token,
@@ -123,15 +228,14 @@ async def upload_chunks(
     """
     try:
         # Log the schema version being used
-        print(f"Processing upload with schema version: {request.schema_version}")
+        logger.info("Processing upload with schema version: %s", request.schema_version)
         
         if request.chunks:
-            # Direct chunks provided
-            chunks_data = [chunk.dict() for chunk in request.chunks]
+            # Direct chunks provided - already validated, handed over as models
             chunks_count = len(request.chunks)
             
             # Add background task to process chunks with schema version
-            background_tasks.add_task(process_chunks, chunks_data, request.schema_version)
+            background_tasks.add_task(process_chunks, request.chunks, request.schema_version)
             
             return UploadResponse(
                 message=f"Direct chunks accepted for processing ({chunks_count} chunks) with schema v{request.schema_version}",
@@ -167,84 +271,173 @@ async def upload_chunks(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing upload: {str(e)}")
 
-async def process_chunks(chunks: List[dict], schema_version: str):
+async def process_chunks(chunks: List[JournalChunk], schema_version: str):
+    """
+    Background task to process chunks, limited by the upload semaphore
+    """
+    async with UPLOAD_SEMAPHORE:
+        try:
+            await ingest_chunks(split_batches(chunks), schema_version)
+        except Exception as e:
+            logger.error("Error in background processing: %s", e)
+
+async def split_batches(chunks: List[JournalChunk]) -> AsyncIterator[List[JournalChunk]]:
     """
-    Background task to process chunks: generate embeddings and store in vector database
+    Split an uploaded chunk list into store batches
     """
+    for i in range(0, len(chunks), STORE_BATCH_SIZE):
+        yield chunks[i:i + STORE_BATCH_SIZE]
+
+async def ingest_chunks(batches: AsyncIterator[List[JournalChunk]], schema_version: str) -> int:
+    """
+    Generate embeddings for one upload's batches of chunks and store them in
+    vector database. The next batch is read and embedded while the previous
+    one is being stored, so peak memory stays bounded by the batch size.
+    Cached searches and documents are invalidated once, after the upload.
+    Returns the number of chunks received. Errors from embedding, storing or
+    the batch source (e.g. a malformed upload file) are raised after the
+    chunks this upload already stored are removed again.
+    """
+    total_chunks = 0
+    total_batches = 0
+    stored_batches = 0
+    stored_ids: List[str] = []
+    pending_store = None
     try:
-        print(f"Processing {len(chunks)} chunks with schema version {schema_version}...")
-        
-        # Extract text content for embedding generation
-        texts = [chunk["text"] for chunk in chunks]
-        
-        # Generate embeddings
-        print("Generating embeddings...")
-        embeddings = embedding_generator.generate_embeddings_batch(texts)
+        async for batch in batches:
+            total_chunks += len(batch)
+            total_batches += 1
+            
+            # Generate embeddings for this batch
+            embeddings = await embedding_generator.generate_embeddings_batch([chunk.text for chunk in batch])
+            
+            # At most one batch is being stored at a time
+            if pending_store is not None:
+                store, pending_store = pending_store, None
+                stored_batches += await collect_store(store, stored_ids)
+            
+            # Store off the event loop so searches keep being served; the
+            # store runs alongside reading and embedding the next batch
+            pending_store = asyncio.create_task(asyncio.to_thread(store_chunks, batch, embeddings, schema_version))
         
-        # Store in vector database
-        print("Storing in vector database...")
-        success = vector_store.add_chunks(chunks, embeddings, schema_version)
+        if pending_store is not None:
+            store, pending_store = pending_store, None
+            stored_batches += await collect_store(store, stored_ids)
         
-        if success:
-            print(f"Successfully processed {len(chunks)} chunks with schema v{schema_version}")
-        else:
-            print("Failed to store chunks in vector database")
-            
-    except Exception as e:
-        print(f"Error in background processing: {str(e)}")
+        if stored_batches < total_batches:
+            raise RuntimeError(f"Failed to store {total_batches - stored_batches} of {total_batches} batches in vector database")
+    
+    except Exception:
+        # Uploads are all-or-nothing: a malformed file or a failed batch must
+        # not leave part of a document searchable
+        if pending_store is not None:
+            try:
+                await collect_store(pending_store, stored_ids)
+            except Exception:
+                logger.exception("Batch store failed during upload rollback")
+        if stored_ids:
+            logger.warning("Upload failed, removing %d chunks it already stored", len(stored_ids))
+            await asyncio.to_thread(vector_store.delete_chunks, stored_ids)
+        raise
+    
+    finally:
+        if stored_ids:
+            # Cached search results and documents may no longer reflect the collection
+            await bump_collection_version()
+    
+    logger.info("Successfully processed %d chunks with schema v%s", total_chunks, schema_version)
+    return total_chunks
+
+async def collect_store(store: "asyncio.Task[Optional[List[str]]]", stored_ids: List[str]) -> bool:
+    """
+    Wait for a batch store, recording the ids it added; True if it succeeded
+    """
+    added_ids = await store
+    if added_ids is None:
+        return False
+    stored_ids.extend(added_ids)
+    return True
+
+def store_chunks(chunks: List[JournalChunk], embeddings: np.ndarray, schema_version: str) -> Optional[List[str]]:
+    """
+    Blocking part of chunk processing: serialize the chunks and insert them into Chroma.
+    Returns the ids this call added - Chroma skips ids that are already stored,
+    so those are left out and never rolled back - or None if the insert failed.
+    """
+    chunks_data = chunk_list_adapter.dump_python(chunks)
+    return vector_store.add_chunks(chunks_data, embeddings, schema_version)
+
+# File ID from Google Drive ".../file/d/<id>/..." or "...?id=<id>" URLs
+_GDRIVE_RE = re.compile(r"drive\.google\.com(?:/.*?)?(?:/file/d/|[?&]id=)([A-Za-z0-9_-]+)")
 
 def convert_google_drive_url(url: str) -> str:
     """
     Convert Google Drive sharing URL to direct download URL
     """
-    if "drive.google.com" in url:
-        # Extract file ID from various Google Drive URL formats
-        if "/file/d/" in url:
-            file_id = url.split("/file/d/")[1].split("/")[0]
-        elif "id=" in url:
-            file_id = url.split("id=")[1].split("&")[0]
-        else:
-            # Try to extract from folders URL or other formats
-            return url  # Return original if can't parse
-        
-        # Convert to direct download URL
-        return f"https://drive.google.com/uc?export=download&id={file_id}"
+    match = _GDRIVE_RE.search(url)
+    if match:
+        return f"https://drive.google.com/uc?export=download&id={match.group(1)}"
     
+    # Not a Google Drive URL, or a format we can't parse (e.g. folders)
     return url
 
+async def parse_batches(f) -> AsyncIterator[List[JournalChunk]]:
+    """
+    Stream-parse a JSON array of chunks from an open file into validated batches
+    """
+    batch = []
+    async for item in ijson.items(f, 'item', use_float=True):
+        batch.append(item)
+        if len(batch) >= STORE_BATCH_SIZE:
+            yield chunk_list_adapter.validate_python(batch)
+            batch = []
+    
+    if batch:
+        yield chunk_list_adapter.validate_python(batch)
+
 async def process_file_path(file_path: str, schema_version: str):
     """
-    Background task to process file from local path, URL, or Google Drive
+    Background task to process a file, limited by the upload semaphore.
+    The slot is held for the download as well, so downloads can't pile up either.
+    """
+    async with UPLOAD_SEMAPHORE:
+        await ingest_file(file_path, schema_version)
+
+async def ingest_file(file_path: str, schema_version: str):
+    """
+    Process file from local path, URL, or Google Drive
     """
     temp_file_path = None
     try:
         # Determine if it's a URL or local file path
         if file_path.startswith(('http://', 'https://')):
             # It's a URL - download the file
-            print(f"Processing URL: {file_path} with schema version {schema_version}")
+            logger.info("Processing URL: %s with schema version %s", file_path, schema_version)
             
             # Convert Google Drive URLs to direct download URLs
             download_url = convert_google_drive_url(file_path)
-            print(f"Download URL: {download_url}")
+            logger.info("Download URL: %s", download_url)
             
-            # Download the file
+            # Create temporary file
+            with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as temp_file:
+                temp_file_path = temp_file.name
+            
+            # Stream the download to disk without blocking the event loop
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
-            response = requests.get(download_url, timeout=30, headers=headers)
-            response.raise_for_status()
+            async with http_client.stream("GET", download_url, headers=headers) as response:
+                response.raise_for_status()
+                async with aiofiles.open(temp_file_path, 'wb') as f:
+                    async for chunk in response.aiter_bytes(1 << 16):
+                        await f.write(chunk)
             
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as temp_file:
-                temp_file.write(response.text)
-                temp_file_path = temp_file.name
-            
-            print(f"File downloaded to: {temp_file_path}")
+            logger.info("File downloaded to: %s", temp_file_path)
             file_to_process = temp_file_path
             
         else:
             # It's a local file path
-            print(f"Processing local file: {file_path} with schema version {schema_version}")
+            logger.info("Processing local file: %s with schema version %s", file_path, schema_version)
             
             # Check if file exists
             if not Path(file_path).exists():
@@ -252,81 +445,96 @@ async def process_file_path(file_path: str, schema_version: str):
             
             file_to_process = file_path
         
-        # Parse JSON content
-        with open(file_to_process, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
+        # Stream-parse the JSON array and process it batch by batch, so memory
+        # stays bounded by the batch size rather than the file size
+        async with aiofiles.open(file_to_process, 'rb') as f:
+            total_chunks = await ingest_chunks(parse_batches(f), schema_version)
         
         # Validate that it's a list of chunks
-        if not isinstance(chunks_data, list):
-            raise ValueError("File must contain a JSON array of chunks")
-        
-        print(f"Found {len(chunks_data)} chunks in file")
-        
-        # Process the chunks
-        await process_chunks(chunks_data, schema_version)
+        if total_chunks == 0:
+            raise ValueError("File must contain a non-empty JSON array of chunks")
         
-        print("File processing completed successfully")
+        logger.info("File processing completed successfully (%d chunks)", total_chunks)
         
-    except requests.RequestException as e:
-        print(f"Error downloading file: {str(e)}")
+    except httpx.HTTPError as e:
+        logger.error("Error downloading file: %s", e)
     except FileNotFoundError as e:
-        print(f"File not found: {str(e)}")
-    except json.JSONDecodeError as e:
-        print(f"Error parsing JSON file: {str(e)}")
+        logger.error("File not found: %s", e)
+    except ijson.JSONError as e:
+        logger.error("Error parsing JSON file: %s", e)
     except Exception as e:
-        print(f"Error processing file: {str(e)}")
+        logger.error("Error processing file: %s", e)
     finally:
         # Clean up temporary file (only if we downloaded it)
         if temp_file_path and Path(temp_file_path).exists():
             try:
                 Path(temp_file_path).unlink()
-                print(f"Temporary file deleted: {temp_file_path}")
+                logger.info("Temporary file deleted: %s", temp_file_path)
             except Exception as e:
-                print(f"Error deleting temporary file: {str(e)}")
+                logger.error("Error deleting temporary file: %s", e)
 
-@app.post("/api/similarity_search", response_model=SimilaritySearchResponse)
+@app.post("/api/similarity_search", response_model=None, responses={200: {"model": SimilaritySearchResponse}})
 async def similarity_search(request: SimilaritySearchRequest):
     """
     Perform semantic similarity search using the provided query.
     Returns top-k most similar chunks with their similarity scores.
     """
-    try:
-        # Generate embedding for the query
-        query_embedding = embedding_generator.generate_embedding(request.query)
-        
-        # Perform similarity search
-        results = vector_store.similarity_search(
-            query_embedding=query_embedding,
-            k=request.k,
-            min_score=request.min_score
+    if request.prefilter_dim and request.prefilter_dim != vector_store.prefilter_dim:
+        raise HTTPException(
+            status_code=400,
+            detail=f"prefilter_dim {request.prefilter_dim} is not enabled (server uses {vector_store.prefilter_dim})"
+        )
+    if request.prefilter_dim and not vector_store.prefilter_ready:
+        raise HTTPException(
+            status_code=400,
+            detail="The prefilter index does not cover every chunk yet; search without prefilter_dim"
         )
+    
+    try:
+        cache_key = (request.query, request.k, request.min_score, request.prefilter_dim, await get_collection_version())
         
-        # Convert to response format and track usage
-        search_results = []
-        for result in results:
-            # Track usage for this chunk
-            usage_tracker.update_usage(result["id"], result["source_doc_id"])
+        # Identical concurrent queries wait for the first one instead of
+        # repeating the embedding call and the vector search
+        async with query_cache.lock(cache_key):
+            results = await query_cache.get(cache_key)
             
-            search_results.append({
-                "id": result["id"],
-                "source_doc_id": result["source_doc_id"],
-                "chunk_index": result["chunk_index"],
-                "section_heading": result["section_heading"],
-                "journal": result["journal"],
-                "publish_year": result["publish_year"],
-                "usage_count": result["usage_count"],
-                "attributes": result["attributes"],
-                "link": result["link"],
-                "text": result["text"],
-                "score": result["score"],
-                "doi": result.get("doi")
-            })
-        
-        return SimilaritySearchResponse(
-            results=search_results,
-            total_results=len(search_results),
-            query=request.query
-        )
+            if results is None:
+                # Generate embedding for the query
+                query_embedding = await embedding_generator.generate_embedding(request.query)
+                
+                # Reuse results of a near-identical earlier query if there is one
+                results = query_cache.get_similar(query_embedding, cache_key)
+                
+                if results is None and request.prefilter_dim:
+                    # Shortlist on truncated embeddings, rescore at full dimension
+                    results = vector_store.similarity_search_prefiltered(
+                        query_embedding=query_embedding,
+                        k=request.k,
+                        min_score=request.min_score
+                    )
+                elif results is None:
+                    # Perform similarity search
+                    results = vector_store.similarity_search(
+                        query_embedding=query_embedding,
+                        k=request.k,
+                        min_score=request.min_score
+                    )
+                
+                # Empty results are not cached: a document uploaded moments
+                # later, or a query that matched nothing, shouldn't stick for the TTL
+                if results:
+                    await query_cache.set(cache_key, query_embedding, results)
+        
+        # Track usage for the returned chunks
+        track_usage([(result["id"], result["source_doc_id"]) for result in results])
+        
+        # Vector store results already have the response shape; returning them
+        # directly skips copying each one and re-validating them
+        return ORJSONResponse(content={
+            "results": results,
+            "total_results": len(results),
+            "query": request.query
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error performing similarity search: {str(e)}")
@@ -358,7 +566,52 @@ async def get_analytics(current_user: TokenData = Depends(require_analytics_perm
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving analytics: {str(e)}")
 
-@app.get("/api/{journal_id}", response_model=JournalDocument)
+class DocumentNotFoundError(Exception):
+    """Raised by the cached document readers, so a miss is never cached"""
+
+async def load_document_chunks(journal_id: str) -> List[dict]:
+    chunks = await asyncio.to_thread(vector_store.get_document_chunks, journal_id)
+    if not chunks:
+        raise DocumentNotFoundError(journal_id)
+    return chunks
+
+async def load_document_full_text(source_doc_id: str) -> dict:
+    paper_data = await asyncio.to_thread(vector_store.get_document_full_text, source_doc_id)
+    if not paper_data:
+        raise DocumentNotFoundError(source_doc_id)
+    return paper_data
+
+@cache(expire=300, namespace="documents", coder=ORJSONCoder)
+async def get_cached_document_chunks(journal_id: str, version: int) -> List[dict]:
+    """
+    Document chunks rarely change between uploads, so the Chroma read is
+    cached rather than the response - usage is still tracked on every hit
+    """
+    return await load_document_chunks(journal_id)
+
+@cache(expire=300, namespace="documents", coder=ORJSONCoder)
+async def get_cached_document_full_text(source_doc_id: str, version: int) -> dict:
+    """
+    Full text of a document, cached alongside its chunks so repeated
+    comparisons against the same paper read Chroma once
+    """
+    return await load_document_full_text(source_doc_id)
+
+async def read_document_chunks(journal_id: str) -> List[dict]:
+    """Document chunks, cached for the current collection version"""
+    version = await get_collection_version()
+    if version is None:
+        return await load_document_chunks(journal_id)
+    return await get_cached_document_chunks(journal_id, version)
+
+async def read_document_full_text(source_doc_id: str) -> dict:
+    """Document full text, cached for the current collection version"""
+    version = await get_collection_version()
+    if version is None:
+        return await load_document_full_text(source_doc_id)
+    return await get_cached_document_full_text(source_doc_id, version)
+
+@app.get("/api/{journal_id}", response_model=None, responses={200: {"model": JournalDocument}})
 async def get_journal_document(journal_id: str):
     """
     Retrieve metadata and all chunk content for a specific journal document.
@@ -366,14 +619,13 @@ async def get_journal_document(journal_id: str):
     """
     try:
         # Get all chunks for the document
-        chunks = vector_store.get_document_chunks(journal_id)
-        
-        if not chunks:
+        try:
+            chunks = await read_document_chunks(journal_id)
+        except DocumentNotFoundError:
             raise HTTPException(status_code=404, detail=f"Document with ID '{journal_id}' not found")
         
         # Track usage for all chunks in the document
-        for chunk in chunks:
-            usage_tracker.update_usage(chunk["id"], chunk["source_doc_id"])
+        track_usage([(chunk["id"], chunk["source_doc_id"]) for chunk in chunks])
         
         # Extract metadata from the first chunk
         first_chunk = chunks[0]
@@ -385,36 +637,116 @@ async def get_journal_document(journal_id: str):
         }
         
         # Add DOI if available
-        if "doi" in first_chunk:
+        if first_chunk.get("doi"):
             metadata["doi"] = first_chunk["doi"]
         
-        return JournalDocument(
-            source_doc_id=first_chunk["source_doc_id"],
-            journal=first_chunk["journal"],
-            publish_year=first_chunk["publish_year"],
-            total_chunks=len(chunks),
-            chunks=chunks,
-            metadata=metadata
-        )
+        # Chunks come straight from the vector store in JournalChunk shape,
+        # so they are returned without another validation pass
+        return ORJSONResponse(content={
+            "source_doc_id": first_chunk["source_doc_id"],
+            "journal": first_chunk["journal"],
+            "publish_year": first_chunk["publish_year"],
+            "total_chunks": len(chunks),
+            "chunks": chunks,
+            "metadata": metadata
+        })
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving document: {str(e)}")
 
-async def generate_paper_summary(paper_data: dict) -> str:
+# Bump when the summary prompt changes so cached summaries are regenerated
+SUMMARY_PROMPT_VERSION = "v2"
+SUMMARY_CACHE_TTL = 86400
+
+# Context windows of the chat models; a model name matches its longest
+# prefix, and unknown models get the smallest window so the prompt fits
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+}
+DEFAULT_CONTEXT_TOKENS = 4096
+
+# Completion tokens reserved for the summary itself
+SUMMARY_MAX_TOKENS = 800
+
+# Chat formatting overhead per request (role markers etc.)
+MESSAGE_OVERHEAD_TOKENS = 16
+
+# Cap on paper text per summary, to bound cost and latency; about the
+# 15,000 characters summaries were always given. The context window is only
+# an upper bound (0 fills it)
+SUMMARY_TEXT_TOKENS = int(os.getenv("SUMMARY_TEXT_TOKENS", "3750"))
+
+# Without a tokenizer, text is measured in characters; 3 per token
+# under-fills rather than overflows the context
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+SUMMARY_SYSTEM_PROMPT = "You are an expert research analyst. Provide clear, structured summaries of academic papers."
+
+# Loaded at startup; None if the tokenizer could not be loaded
+summary_encoding: Optional[tiktoken.Encoding] = None
+
+def load_encoding(model: str) -> Optional[tiktoken.Encoding]:
     """
-    Generate a summary of a paper using OpenAI
+    Tokenizer for a chat model, falling back to cl100k_base for unknown models.
+    The first load downloads the BPE file, so this can fail without network.
     """
     try:
-        prompt = f"""Please provide a comprehensive summary of this research paper:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning("Tokenizer for %s unavailable, truncating by characters: %s", model, e)
+        return None
+
+@app.on_event("startup")
+async def load_summary_encoding():
+    """Load the summary tokenizer once, off the event loop"""
+    global summary_encoding
+    summary_encoding = await asyncio.to_thread(load_encoding, os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo"))
+
+def context_window(model: str) -> int:
+    """Context window of a chat model, overridable with OPENAI_CHAT_CONTEXT_TOKENS"""
+    override = os.getenv("OPENAI_CHAT_CONTEXT_TOKENS")
+    if override:
+        return int(override)
+    prefixes = [prefix for prefix in MODEL_CONTEXT_TOKENS if model.startswith(prefix)]
+    return MODEL_CONTEXT_TOKENS[max(prefixes, key=len)] if prefixes else DEFAULT_CONTEXT_TOKENS
+
+def count_tokens(text: str) -> int:
+    """Token count of text, estimated from its length without a tokenizer"""
+    if summary_encoding is None:
+        return len(text) // CHARS_PER_TOKEN_ESTIMATE + 1
+    return len(summary_encoding.encode(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Trim text to at most max_tokens tokens"""
+    if summary_encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN_ESTIMATE]
+    # Tokens average well under 8 characters, so this bounds encoding work on
+    # very long papers without cutting below the budget in practice
+    text = text[:max_tokens * 8]
+    tokens = summary_encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return summary_encoding.decode(tokens[:max_tokens])
+
+def build_summary_prompt(paper_data: dict, full_text: str) -> str:
+    """User prompt for a paper summary"""
+    return f"""Please provide a comprehensive summary of this research paper:
 
 Title/Journal: {paper_data['journal']}
 Publication Year: {paper_data['publish_year']}
 Total Sections: {paper_data['total_chunks']}
 
 Full Text:
-{paper_data['full_text'][:15000]}  # Limit to avoid token limits
+{full_text}
 
 Please provide a structured summary including:
 1. Main research question/objective
@@ -425,20 +757,58 @@ Please provide a structured summary including:
 
 Keep the summary concise but comprehensive (300-500 words)."""
 
-        response = openai_client.chat.completions.create(
-            model=os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo"),
+def summary_text_budget(model: str, paper_data: dict) -> int:
+    """Tokens of paper text that fit next to the prompt and the reserved completion"""
+    overhead = count_tokens(SUMMARY_SYSTEM_PROMPT + build_summary_prompt(paper_data, "")) + MESSAGE_OVERHEAD_TOKENS
+    budget = context_window(model) - SUMMARY_MAX_TOKENS - overhead
+    if SUMMARY_TEXT_TOKENS:
+        budget = min(budget, SUMMARY_TEXT_TOKENS)
+    return max(budget, 0)
+
+def summary_cache_key(paper_data: dict, model: str) -> str:
+    """Redis key for a paper summary; includes the chunk count so re-uploads miss"""
+    raw = f"{paper_data['source_doc_id']}:{paper_data['total_chunks']}:{model}:{SUMMARY_PROMPT_VERSION}"
+    return "summary:" + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+async def generate_paper_summary(paper_data: dict) -> str:
+    """
+    Generate a summary of a paper using OpenAI, reusing a cached summary if available
+    """
+    try:
+        model = os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo")
+        cache_key = summary_cache_key(paper_data, model)
+        try:
+            cached = redis_client.get(cache_key)
+        except redis.RedisError as e:
+            # The cache is an optimization; fall back to generating the summary
+            logger.warning("Summary cache lookup failed: %s", e)
+            cached = None
+        if cached:
+            return cached
+        
+        full_text = truncate_to_tokens(paper_data['full_text'], summary_text_budget(model, paper_data))
+        prompt = build_summary_prompt(paper_data, full_text)
+
+        response = await openai_client.chat.completions.create(
+            model=model,
             messages=[
-                {"role": "system", "content": "You are an expert research analyst. Provide clear, structured summaries of academic papers."},
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
-            max_tokens=800,
+            max_tokens=SUMMARY_MAX_TOKENS,
             temperature=0.3
         )
         
-        return response.choices[0].message.content.strip()
+        summary = response.choices[0].message.content.strip()
+        # Only successful summaries are cached; errors below are returned as text
+        try:
+            redis_client.setex(cache_key, SUMMARY_CACHE_TTL, summary)
+        except redis.RedisError as e:
+            logger.warning("Summary cache store failed: %s", e)
+        return summary
         
     except Exception as e:
-        print(f"Error generating summary: {str(e)}")
+        logger.error("Error generating summary: %s", e)
         return f"Error generating summary for this paper: {str(e)}"
 
 async def generate_comparison(paper1_data: dict, paper2_data: dict, summary1: str, summary2: str) -> str:
@@ -466,7 +836,7 @@ Please provide a detailed comparison covering:
 
 Structure your comparison to highlight both similarities and differences, and discuss how these papers might relate to each other in the broader research landscape."""
 
-        response = openai_client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model=os.getenv("OPENAI_CHAT_MODEL", "gpt-3.5-turbo"),
             messages=[
                 {"role": "system", "content": "You are an expert research analyst specializing in comparative analysis of academic papers."},
@@ -479,7 +849,7 @@ Structure your comparison to highlight both similarities and differences, and di
         return response.choices[0].message.content.strip()
         
     except Exception as e:
-        print(f"Error generating comparison: {str(e)}")
+        logger.error("Error generating comparison: %s", e)
         return f"Error generating comparison: {str(e)}"
 
 @app.post("/api/compare", response_model=CompareResponse)
@@ -489,31 +859,29 @@ async def compare_papers(request: CompareRequest):
     Takes two source_doc_ids and returns summaries for each paper plus a comparison.
     """
     try:
-        print(f"Comparing papers: {request.source_doc_id_1} vs {request.source_doc_id_2}")
-        
-        # Get full text for both papers
-        paper1_data = vector_store.get_document_full_text(request.source_doc_id_1)
-        paper2_data = vector_store.get_document_full_text(request.source_doc_id_2)
-        
-        # Check if both papers exist
-        if not paper1_data:
-            raise HTTPException(status_code=404, detail=f"Paper with ID '{request.source_doc_id_1}' not found")
+        logger.info("Comparing papers: %s vs %s", request.source_doc_id_1, request.source_doc_id_2)
         
-        if not paper2_data:
-            raise HTTPException(status_code=404, detail=f"Paper with ID '{request.source_doc_id_2}' not found")
-        
-        print(f"Retrieved paper 1: {paper1_data['journal']} ({paper1_data['publish_year']})")
-        print(f"Retrieved paper 2: {paper2_data['journal']} ({paper2_data['publish_year']})")
+        # Get full text for both papers concurrently
+        try:
+            paper1_data, paper2_data = await asyncio.gather(
+                read_document_full_text(request.source_doc_id_1),
+                read_document_full_text(request.source_doc_id_2)
+            )
+        except DocumentNotFoundError as e:
+            raise HTTPException(status_code=404, detail=f"Paper with ID '{e.args[0]}' not found")
         
-        # Generate summaries for both papers
-        print("Generating summary for paper 1...")
-        summary1 = await generate_paper_summary(paper1_data)
+        logger.info("Retrieved paper 1: %s (%s)", paper1_data["journal"], paper1_data["publish_year"])
+        logger.info("Retrieved paper 2: %s (%s)", paper2_data["journal"], paper2_data["publish_year"])
         
-        print("Generating summary for paper 2...")
-        summary2 = await generate_paper_summary(paper2_data)
+        # Generate summaries for both papers concurrently
+        logger.info("Generating summaries for both papers...")
+        summary1, summary2 = await asyncio.gather(
+            generate_paper_summary(paper1_data),
+            generate_paper_summary(paper2_data)
+        )
         
         # Generate comparison
-        print("Generating comparison analysis...")
+        logger.info("Generating comparison analysis...")
         comparison = await generate_comparison(paper1_data, paper2_data, summary1, summary2)
         
         # Prepare response
@@ -551,13 +919,13 @@ async def compare_papers(request: CompareRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in comparison: {str(e)}")
+        logger.error("Error in comparison: %s", e)
         raise HTTPException(status_code=500, detail=f"Error comparing papers: {str(e)}")
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content=ErrorResponse(
             error="Internal server error",
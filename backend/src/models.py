@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from typing import List, Optional, Union
 from datetime import datetime
 
@@ -16,26 +16,21 @@ class JournalChunk(BaseModel):
     doi: Optional[str] = None
 
 class UploadRequest(BaseModel):
+    model_config = ConfigDict(extra='forbid', str_strip_whitespace=True)
+    
     chunks: Optional[List[JournalChunk]] = None
     file_path: Optional[str] = None
     schema_version: str = Field(description="Schema version for the data format")
     
-    @validator('chunks', 'file_path')
-    def validate_chunks_or_file_path(cls, v, values):
-        chunks = values.get('chunks') if 'chunks' in values else v
-        file_path = values.get('file_path') if 'file_path' in values else None
-        
-        # If this is the file_path field being validated
-        if v is not None and isinstance(v, str):
-            file_path = v
-        
+    @model_validator(mode='after')
+    def validate_chunks_or_file_path(self):
         # Check that exactly one of chunks or file_path is provided
-        if chunks is not None and file_path is not None:
+        if self.chunks is not None and self.file_path is not None:
             raise ValueError('Provide either chunks or file_path, not both')
-        if chunks is None and file_path is None:
+        if self.chunks is None and self.file_path is None:
             raise ValueError('Must provide either chunks or file_path')
         
-        return v
+        return self
 
 class UploadResponse(BaseModel):
     message: str
@@ -46,6 +41,7 @@ class SimilaritySearchRequest(BaseModel):
     query: str
     k: int = Field(default=10, ge=1, le=100, description="Number of results to return")
     min_score: float = Field(default=0.25, ge=0.0, le=1.0, description="Minimum similarity score")
+    prefilter_dim: int = Field(default=0, ge=0, description="Shortlist on this many embedding dimensions before full rescoring (0 disables)")
 
 class SearchResult(BaseModel):
     id: str
@@ -0,0 +1,136 @@
+import os
+import asyncio
+import hashlib
+import logging
+import redis
+import orjson
+import numpy as np
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple
+from cachetools import TTLCache
+from dotenv import load_dotenv
+
+try:
+    from .usage_tracker import redis_async_client
+except ImportError:
+    from usage_tracker import redis_async_client
+
+load_dotenv()
+
+logger = logging.getLogger("research_assistant.query_cache")
+
+# (query, k, min_score, prefilter_dim, collection version); a version of
+# None means it couldn't be read and the search is not cached
+CacheKey = Tuple[str, int, float, int, Optional[int]]
+
+class SemanticQueryCache:
+    """
+    Two-tier cache for similarity search results: exact match on
+    (query, k, min_score, prefilter_dim, collection version), in memory and
+    shared between workers through Redis, then cosine match against this
+    worker's recent query embeddings with the same search parameters.
+    """
+
+    def __init__(self):
+        self.maxsize = int(os.getenv("QUERY_CACHE_SIZE", "5000"))
+        self.ttl = int(os.getenv("QUERY_CACHE_TTL", "600"))
+        self.threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.97"))
+
+        self._entries = TTLCache(maxsize=self.maxsize, ttl=self.ttl)
+        self._locks: Dict[CacheKey, list] = {}
+
+        # Ring buffer of normalized query embeddings; a slot is only a hit
+        # while its key is still live in _entries
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[CacheKey]] = [None] * self.maxsize
+        self._next_slot = 0
+
+    @asynccontextmanager
+    async def lock(self, key: CacheKey):
+        """Serialize concurrent lookups for the same key (singleflight)"""
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+    async def get(self, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for an exact query match"""
+        if key[-1] is None:
+            return None
+        
+        results = self._entries.get(key)
+        if results is None:
+            results = await self._get_shared(key)
+            if results is not None:
+                self._entries[key] = results
+        return results
+
+    def get_similar(self, embedding: np.ndarray, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for the most similar cached query above the threshold"""
+        if self._matrix is None:
+            return None
+
+        query = self._normalize(embedding)
+        similarities = self._matrix @ query
+
+        # Best candidates first; stop at the first live entry with matching params
+        for slot in np.argsort(similarities)[::-1]:
+            if similarities[slot] < self.threshold:
+                break
+            slot_key = self._slot_keys[slot]
+            if slot_key is None or slot_key[1:] != key[1:]:
+                continue
+            results = self._entries.get(slot_key)
+            if results is not None:
+                return results
+
+        return None
+
+    async def set(self, key: CacheKey, embedding: np.ndarray, results: List[Dict[str, Any]]):
+        """Cache results along with the query embedding that produced them"""
+        if key[-1] is None:
+            return
+        
+        query = self._normalize(embedding)
+        if self._matrix is None:
+            self._matrix = np.zeros((self.maxsize, query.shape[0]), dtype=np.float32)
+
+        slot = self._next_slot
+        self._matrix[slot] = query
+        self._slot_keys[slot] = key
+        self._next_slot = (slot + 1) % self.maxsize
+
+        self._entries[key] = results
+        await self._set_shared(key, results)
+
+    async def _get_shared(self, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        """Results cached by any worker; the cache is best-effort if Redis is down"""
+        try:
+            cached = await redis_async_client.get(self._shared_key(key))
+        except redis.RedisError:
+            logger.warning("Redis unavailable, skipping shared query cache lookup")
+            return None
+        return orjson.loads(cached) if cached else None
+
+    async def _set_shared(self, key: CacheKey, results: List[Dict[str, Any]]):
+        try:
+            await redis_async_client.setex(self._shared_key(key), self.ttl, orjson.dumps(results, option=orjson.OPT_SERIALIZE_NUMPY))
+        except redis.RedisError:
+            logger.warning("Redis unavailable, search results cached in this worker only")
+
+    @staticmethod
+    def _shared_key(key: CacheKey) -> str:
+        return "query_cache:" + hashlib.sha256(orjson.dumps(key)).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = embedding.astype(np.float32, copy=False)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
@@ -1,4 +1,5 @@
 import redis
+import redis.asyncio
 import json
 import os
 from datetime import datetime
@@ -6,78 +7,95 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-# Configure Redis client with environment variables
-redis_client = redis.Redis(
-    host=os.getenv("REDIS_HOST", "localhost"),
-    port=int(os.getenv("REDIS_PORT", 6379)),
-    db=int(os.getenv("REDIS_DB", 2))
-)
+# Configure Redis clients with environment variables. Bounded pools are
+# shared by all requests.
+redis_settings = {
+    "host": os.getenv("REDIS_HOST", "localhost"),
+    "port": int(os.getenv("REDIS_PORT", 6379)),
+    "db": int(os.getenv("REDIS_DB", 2)),
+    "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", 32)),
+    "timeout": 5,
+    # Never wait on an unresponsive server longer than on a free connection
+    "socket_connect_timeout": 5,
+    "socket_timeout": 5
+}
+
+# Replies are decoded to str by the (hiredis) parser
+redis_pool = redis.BlockingConnectionPool(**redis_settings, decode_responses=True)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# asyncio client with raw bytes replies (e.g. packed embeddings), for caches
+# read on the request path so lookups don't block the event loop
+redis_async_pool = redis.asyncio.BlockingConnectionPool(**redis_settings)
+redis_async_client = redis.asyncio.Redis(connection_pool=redis_async_pool)
 
 class RedisUsageTracker:
     
     def update_usage(self, chunk_id, source_doc_id):
         """Update usage count and last accessed time"""
+        return self.update_usage_many([(chunk_id, source_doc_id)])[0]
+    
+    def update_usage_many(self, usages):
+        """Update usage for (chunk_id, source_doc_id) pairs in a single round trip"""
+        today = datetime.now().strftime("%Y-%m-%d")
         
-        # Use Redis Hash to store structured data
-        usage_key = f"usage:{chunk_id}"
-        
-        # Get current count or default to 0
-        current_count = redis_client.hget(usage_key, "usage_count")
-        new_count = int(current_count) + 1 if current_count else 1
-        
-        # Update all fields atomically
-        redis_client.hset(usage_key, mapping={
-            "chunk_id": chunk_id,
-            "usage_count": new_count,
-            "last_accessed": datetime.now().strftime("%Y-%m-%d"),
-            "source_doc_id": source_doc_id
-        })
-        
-        # Also maintain a sorted set for rankings
-        redis_client.zadd("popular_chunks", {chunk_id: new_count})
+        # No transaction needed: HINCRBY/ZINCRBY are atomic on their own
+        pipe = redis_client.pipeline(transaction=False)
+        for chunk_id, source_doc_id in usages:
+            # Use Redis Hash to store structured data
+            usage_key = f"usage:{chunk_id}"
+            pipe.hincrby(usage_key, "usage_count", 1)
+            pipe.hset(usage_key, mapping={
+                "chunk_id": chunk_id,
+                "last_accessed": today,
+                "source_doc_id": source_doc_id
+            })
+            # Also maintain a sorted set for rankings
+            pipe.zincrby("popular_chunks", 1, chunk_id)
         
-        return new_count
+        # Every third reply is the new HINCRBY count
+        return pipe.execute()[0::3]
     
     def get_usage_data(self, chunk_id):
         """Get complete usage data for a chunk"""
-        usage_key = f"usage:{chunk_id}"
-        data = redis_client.hgetall(usage_key)
+        return self.get_usage_data_many([chunk_id])[0]
+    
+    def get_usage_data_many(self, chunk_ids):
+        """Get usage data for several chunks in a single round trip"""
+        pipe = redis_client.pipeline(transaction=False)
+        for chunk_id in chunk_ids:
+            pipe.hgetall(f"usage:{chunk_id}")
         
+        return [self._parse_usage_data(data) for data in pipe.execute()]
+    
+    @staticmethod
+    def _parse_usage_data(data):
         if not data:
             return None
             
-        # Convert bytes to strings and parse
         return {
-            "chunk_id": data[b"chunk_id"].decode(),
-            "usage_count": int(data[b"usage_count"]),
-            "last_accessed": data[b"last_accessed"].decode(),
-            "source_doc_id": data[b"source_doc_id"].decode()
+            "chunk_id": data["chunk_id"],
+            "usage_count": int(data["usage_count"]),
+            "last_accessed": data["last_accessed"],
+            "source_doc_id": data["source_doc_id"]
         }
     
     def get_popular_chunks(self, limit=10):
         """Get top chunks by usage count"""
         # Get top chunks from sorted set (highest scores first)
-        popular = redis_client.zrevrange("popular_chunks", 0, limit-1, withscores=True)
-        
-        results = []
-        for chunk_id, score in popular:
-            usage_data = self.get_usage_data(chunk_id.decode())
-            if usage_data:
-                results.append(usage_data)
+        popular = redis_client.zrevrange("popular_chunks", 0, limit-1)
         
-        return results
+        usage_data = self.get_usage_data_many(popular)
+        return [data for data in usage_data if data]
     
     def get_all_usage_stats(self):
         """Get usage stats for all chunks"""
-        # Find all usage keys
-        usage_keys = redis_client.keys("usage:*")
+        # The popular_chunks sorted set tracks every chunk with usage, so it is
+        # used instead of KEYS, which scans the whole keyspace and blocks Redis
+        chunk_ids = redis_client.zrange("popular_chunks", 0, -1)
         
-        results = []
-        for key in usage_keys:
-            chunk_id = key.decode().replace("usage:", "")
-            usage_data = self.get_usage_data(chunk_id)
-            if usage_data:
-                results.append(usage_data)
+        usage_data = self.get_usage_data_many(chunk_ids)
+        results = [data for data in usage_data if data]
         
         # Sort by usage count
-        return sorted(results, key=lambda x: x["usage_count"], reverse=True) 
\ No newline at end of file
+        return sorted(results, key=lambda x: x["usage_count"], reverse=True)
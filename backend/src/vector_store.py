@@ -1,140 +1,325 @@
 import os
+import logging
 import chromadb
+import numpy as np
 from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 from dotenv import load_dotenv
-import json
+import orjson
 
 load_dotenv()
 
+logger = logging.getLogger("research_assistant.vector_store")
+
+# Candidates fetched from the prefilter index per requested result
+PREFILTER_OVERSAMPLE = 10
+
+# Chunks read per page when backfilling the prefilter index
+PREFILTER_BACKFILL_BATCH = 1000
+
+def _normalize(embeddings: np.ndarray) -> np.ndarray:
+    """
+    Scale embeddings (one per row, or a single vector) to unit length,
+    as a C-contiguous float32 array
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=-1, keepdims=True)
+
+def _build_meta(chunk: Dict[str, Any], schema_version: str) -> Dict[str, Any]:
+    """
+    Build the Chroma metadata for a chunk
+    """
+    metadata = {
+        "source_doc_id": chunk["source_doc_id"],
+        "chunk_index": chunk["chunk_index"],
+        "section_heading": chunk["section_heading"],
+        "journal": chunk["journal"],
+        "publish_year": chunk["publish_year"],
+        "usage_count": chunk["usage_count"],
+        "attributes": orjson.dumps(chunk["attributes"]).decode(),
+        "link": chunk["link"],
+        "schema_version": schema_version
+    }
+    if chunk.get("doi"):
+        metadata["doi"] = chunk["doi"]
+    
+    return metadata
+
+def _chunk_from_meta(chunk_id: str, metadata: Dict[str, Any], text: str, score: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Build a chunk (or, given a score, a search result) from stored metadata
+    """
+    # Chroma's metadata already uses the response keys; only doi and
+    # schema_version may be missing on older chunks
+    chunk = {"id": chunk_id, "doi": None, "schema_version": "1.0", **metadata, "text": text}
+    chunk["attributes"] = orjson.loads(metadata["attributes"])
+    if score is not None:
+        chunk["score"] = score
+    
+    return chunk
+
 class ChromaVectorStore:
     def __init__(self):
         self.db_path = os.getenv("CHROMA_DB_PATH", "./chroma_db")
         self.collection_name = os.getenv("CHROMA_COLLECTION_NAME", "journal_chunks")
         
-        # Initialize ChromaDB client
-        self.client = chromadb.PersistentClient(
-            path=self.db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # Initialize ChromaDB client. The embedded client keeps its HNSW index
+        # in this process, so several workers need a shared Chroma server
+        self.chroma_host = os.getenv("CHROMA_HOST")
+        if self.chroma_host:
+            self.client = chromadb.HttpClient(
+                host=self.chroma_host,
+                port=int(os.getenv("CHROMA_PORT", "8001")),
+                settings=Settings(anonymized_telemetry=False)
+            )
+        else:
+            self.client = chromadb.PersistentClient(
+                path=self.db_path,
+                settings=Settings(anonymized_telemetry=False)
+            )
         
         # Get or create collection
         self.collection = self._get_or_create_collection()
+        
+        # Collections created before the switch to cosine still use L2; on
+        # unit vectors their squared distance is twice the cosine distance
+        space = (self.collection.metadata or {}).get("hnsw:space", "l2")
+        self._distance_scale = 0.5 if space == "l2" else 1.0
+        
+        # Optional truncated-embedding index for two-stage search. Only useful
+        # for matryoshka-trained embedders (e.g. text-embedding-3-*); 0 disables it
+        self.prefilter_dim = int(os.getenv("MATRYOSHKA_PREFILTER_DIM", "0"))
+        self.prefilter_collection = self._get_prefilter_collection() if self.prefilter_dim else None
+        # Prefiltered search is only offered while the index covers every chunk
+        self.prefilter_ready = self._backfill_prefilter() if self.prefilter_dim else False
     
     def _get_or_create_collection(self):
         """
-        Get existing collection or create a new one
+        Get existing collection or create a new one. get_or_create_collection
+        is not used: given metadata, it rewrites an existing collection's
+        metadata, which would try to switch older L2 collections to cosine.
         """
-        try:
+        # Checked up front: the embedded client raises ValueError for a
+        # missing collection, but the HTTP client raises a plain Exception
+        existing = {collection.name for collection in self.client.list_collections()}
+        if self.collection_name in existing:
             collection = self.client.get_collection(name=self.collection_name)
-            print(f"Using existing collection: {self.collection_name}")
-        except:
+            logger.info("Using existing collection: %s", self.collection_name)
+        else:
             collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"description": "Journal chunks for semantic search"}
+                metadata={"description": "Journal chunks for semantic search", "hnsw:space": "cosine"}
             )
-            print(f"Created new collection: {self.collection_name}")
+            logger.info("Created new collection: %s", self.collection_name)
         
         return collection
     
-    def add_chunks(self, chunks: List[Dict[str, Any]], embeddings: List[List[float]], schema_version: str = "1.0") -> bool:
+    def _get_prefilter_collection(self):
+        """
+        Get or create the collection holding truncated, normalized embeddings
+        """
+        name = f"{self.collection_name}_prefilter_{self.prefilter_dim}"
+        collection = self.client.get_or_create_collection(
+            name=name,
+            metadata={"description": "Truncated embeddings for two-stage search", "hnsw:space": "ip"}
+        )
+        logger.info("Using prefilter collection: %s", name)
+        return collection
+    
+    def _backfill_prefilter(self) -> bool:
         """
-        Add chunks with their embeddings to the vector store
+        Index chunks missing from the prefilter collection, e.g. ones stored
+        before MATRYOSHKA_PREFILTER_DIM was set. Returns whether it is complete
         """
         try:
-            # Prepare data for ChromaDB
-            ids = [chunk["id"] for chunk in chunks]
-            texts = [chunk["text"] for chunk in chunks]
-            metadatas = []
-            
-            for chunk in chunks:
-                metadata = {
-                    "source_doc_id": chunk["source_doc_id"],
-                    "chunk_index": chunk["chunk_index"],
-                    "section_heading": chunk["section_heading"],
-                    "journal": chunk["journal"],
-                    "publish_year": chunk["publish_year"],
-                    "usage_count": chunk["usage_count"],
-                    "attributes": json.dumps(chunk["attributes"]),
-                    "link": chunk["link"],
-                    "schema_version": schema_version
-                }
-                if "doi" in chunk and chunk["doi"]:
-                    metadata["doi"] = chunk["doi"]
-                
-                metadatas.append(metadata)
-            
-            # Add to collection
+            total = self.collection.count()
+            indexed = self.prefilter_collection.count()
+            if indexed == total:
+                return True
+            
+            logger.info("Backfilling prefilter index (%d of %d chunks indexed)", indexed, total)
+            for offset in range(0, total, PREFILTER_BACKFILL_BATCH):
+                page = self.collection.get(include=["embeddings"], limit=PREFILTER_BACKFILL_BATCH, offset=offset)
+                if not page["ids"]:
+                    break
+                # Upsert, so chunks that are already indexed are simply rewritten
+                self.prefilter_collection.upsert(
+                    ids=page["ids"],
+                    embeddings=self._truncate(np.asarray(page["embeddings"], dtype=np.float32)).tolist()
+                )
+            
+            complete = self.prefilter_collection.count() == self.collection.count()
+            if not complete:
+                logger.warning("Prefilter index is incomplete; prefiltered search is disabled")
+            return complete
+            
+        except Exception:
+            logger.exception("Error backfilling prefilter index; prefiltered search is disabled")
+            return False
+    
+    def _truncate(self, embeddings: np.ndarray) -> np.ndarray:
+        """
+        Keep the first prefilter_dim dimensions and renormalize
+        """
+        return _normalize(embeddings[..., :self.prefilter_dim])
+    
+    def add_chunks(self, chunks: List[Dict[str, Any]], embeddings: np.ndarray, schema_version: str = "1.0") -> Optional[List[str]]:
+        """
+        Add chunks with their embeddings to the vector store. Returns the ids
+        this call added - Chroma skips ids that are already stored - or None
+        if the insert failed, in which case nothing it added is left behind.
+        """
+        try:
+            # Prepare data for ChromaDB in a single pass over the chunks
+            ids, texts, metadatas = map(list, zip(*(
+                (chunk["id"], chunk["text"], _build_meta(chunk, schema_version))
+                for chunk in chunks
+            )))
+            
+            if embeddings.ndim != 2 or embeddings.shape[0] != len(ids):
+                raise ValueError(f"Expected {len(ids)} embeddings, got array of shape {embeddings.shape}")
+            
+            # Stored vectors are unit length, so rescoring needs no norms
+            embeddings = _normalize(embeddings)
+            
+            existing = self.existing_ids(ids)
+            
+            # Add to collection (Chroma expects plain lists). Callers already
+            # insert in UPLOAD_STORE_BATCH_SIZE batches, so the input is bounded
             self.collection.add(
                 ids=ids,
-                embeddings=embeddings,
+                embeddings=embeddings.tolist(),
                 documents=texts,
                 metadatas=metadatas
             )
             
-            print(f"Successfully added {len(chunks)} chunks to vector store with schema v{schema_version}")
+        except Exception:
+            logger.exception("Error adding chunks to vector store")
+            if self.prefilter_collection is not None:
+                # A partial insert would leave chunks missing from the prefilter index
+                self.prefilter_ready = False
+            return None
+        
+        added_ids = [chunk_id for chunk_id in ids if chunk_id not in existing]
+        
+        if self.prefilter_collection is not None:
+            try:
+                self.prefilter_collection.add(
+                    ids=ids,
+                    embeddings=self._truncate(embeddings).tolist()
+                )
+            except Exception:
+                # Take the chunks out of the main collection again, so a
+                # failed insert is not left searchable
+                logger.exception("Error adding chunks to prefilter index, removing them again")
+                if not self.delete_chunks(added_ids):
+                    self.prefilter_ready = False
+                return None
+        
+        logger.info("Added %d chunks to vector store with schema v%s", len(chunks), schema_version)
+        return added_ids
+    
+    def existing_ids(self, ids: List[str]) -> Set[str]:
+        """
+        Which of the given chunk ids are already stored
+        """
+        return set(self.collection.get(ids=ids, include=[])["ids"])
+    
+    def delete_chunks(self, ids: List[str]) -> bool:
+        """
+        Remove chunks from the vector store (and the prefilter index)
+        """
+        try:
+            self.collection.delete(ids=ids)
+            if self.prefilter_collection is not None:
+                self.prefilter_collection.delete(ids=ids)
+            
+            logger.info("Deleted %d chunks from vector store", len(ids))
             return True
             
-        except Exception as e:
-            print(f"Error adding chunks to vector store: {str(e)}")
+        except Exception:
+            logger.exception("Error deleting chunks from vector store")
             return False
     
-    def similarity_search(self, query_embedding: List[float], k: int = 10, min_score: float = 0.25) -> List[Dict[str, Any]]:
+    def similarity_search(self, query_embedding: np.ndarray, k: int = 10, min_score: float = 0.25) -> List[Dict[str, Any]]:
         """
-        Perform similarity search using query embedding
+        Perform similarity search using query embedding. Errors are raised
+        rather than returned as an empty list, so they are never cached
+        as "no results"
         """
         try:
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=[_normalize(query_embedding).tolist()],
                 n_results=k,
                 include=["documents", "metadatas", "distances"]
             )
             
-            # Process results
+            # Convert distance to cosine similarity
+            scores = 1.0 - self._distance_scale * np.asarray(results["distances"][0], dtype=np.float32)
+            
+            # Only build results for hits above the threshold
+            processed_results = [
+                _chunk_from_meta(chunk_id, metadata, text, score)
+                for chunk_id, metadata, text, score in zip(
+                    results["ids"][0], results["metadatas"][0], results["documents"][0], scores.tolist()
+                )
+                if score >= min_score
+            ]
+            
+            # Chroma returns nearest first, so results are already ordered by
+            # descending score
+            return processed_results
+            
+        except Exception:
+            logger.exception("Error performing similarity search")
+            raise
+    
+    def similarity_search_prefiltered(self, query_embedding: np.ndarray, k: int = 10, min_score: float = 0.25) -> List[Dict[str, Any]]:
+        """
+        Two-stage search: shortlist candidates on the truncated embeddings,
+        then rescore the shortlist with the full embeddings. Errors are raised
+        like in similarity_search
+        """
+        try:
+            shortlist = self.prefilter_collection.query(
+                query_embeddings=[self._truncate(query_embedding).tolist()],
+                n_results=k * PREFILTER_OVERSAMPLE,
+                include=[]
+            )
+            if not shortlist["ids"][0]:
+                return []
+            
+            candidates = self.collection.get(
+                ids=shortlist["ids"][0],
+                include=["embeddings", "documents", "metadatas"]
+            )
+            
+            # All vectors are unit length, so one matmul gives the cosine
+            # similarity of every candidate
+            matrix = np.asarray(candidates["embeddings"], dtype=np.float32)
+            scores = matrix @ _normalize(query_embedding)
+            
             processed_results = []
-            for i in range(len(results["ids"][0])):
-                chunk_id = results["ids"][0][i]
-                distance = results["distances"][0][i]
-                metadata = results["metadatas"][0][i]
-                text = results["documents"][0][i]
-                
-                # Convert distance to similarity score (ChromaDB returns L2 distance)
-                # We'll convert to a similarity score between 0 and 1
-                similarity_score = max(0, 1 - distance)
-                
-                if similarity_score >= min_score:
-                    result = {
-                        "id": chunk_id,
-                        "source_doc_id": metadata["source_doc_id"],
-                        "chunk_index": metadata["chunk_index"],
-                        "section_heading": metadata["section_heading"],
-                        "journal": metadata["journal"],
-                        "publish_year": metadata["publish_year"],
-                        "usage_count": metadata["usage_count"],
-                        "attributes": json.loads(metadata["attributes"]),
-                        "link": metadata["link"],
-                        "text": text,
-                        "score": similarity_score,
-                        "schema_version": metadata.get("schema_version", "1.0")
-                    }
-                    
-                    if "doi" in metadata:
-                        result["doi"] = metadata["doi"]
-                    
-                    processed_results.append(result)
-            
-            # Sort by similarity score (highest first)
-            processed_results.sort(key=lambda x: x["score"], reverse=True)
+            for i in np.argsort(-scores)[:k]:
+                if scores[i] < min_score:
+                    break
+                processed_results.append(_chunk_from_meta(
+                    candidates["ids"][i],
+                    candidates["metadatas"][i],
+                    candidates["documents"][i],
+                    float(scores[i])
+                ))
             
             return processed_results
             
-        except Exception as e:
-            print(f"Error performing similarity search: {str(e)}")
-            return []
+        except Exception:
+            logger.exception("Error performing prefiltered similarity search")
+            raise
     
     def get_document_chunks(self, source_doc_id: str) -> List[Dict[str, Any]]:
         """
-        Retrieve all chunks for a specific document
+        Retrieve all chunks for a specific document. An unknown document gives
+        an empty list; errors are raised so they can't be mistaken for one
         """
         try:
             results = self.collection.get(
@@ -142,69 +327,48 @@ class ChromaVectorStore:
                 include=["documents", "metadatas"]
             )
             
-            chunks = []
-            for i in range(len(results["ids"])):
-                chunk_id = results["ids"][i]
-                metadata = results["metadatas"][i]
-                text = results["documents"][i]
-                
-                chunk = {
-                    "id": chunk_id,
-                    "source_doc_id": metadata["source_doc_id"],
-                    "chunk_index": metadata["chunk_index"],
-                    "section_heading": metadata["section_heading"],
-                    "journal": metadata["journal"],
-                    "publish_year": metadata["publish_year"],
-                    "usage_count": metadata["usage_count"],
-                    "attributes": json.loads(metadata["attributes"]),
-                    "link": metadata["link"],
-                    "text": text,
-                    "schema_version": metadata.get("schema_version", "1.0")
-                }
-                
-                if "doi" in metadata:
-                    chunk["doi"] = metadata["doi"]
-                
-                chunks.append(chunk)
-            
-            # Sort by chunk_index
-            chunks.sort(key=lambda x: x["chunk_index"])
-            
-            return chunks
-            
-        except Exception as e:
-            print(f"Error retrieving document chunks: {str(e)}")
-            return []
+            # Visit chunks in chunk_index order instead of sorting the built dicts
+            chunk_indexes = np.fromiter(
+                (metadata["chunk_index"] for metadata in results["metadatas"]),
+                dtype=np.int64,
+                count=len(results["ids"])
+            )
+            order = np.argsort(chunk_indexes, kind="stable")
+            
+            return [
+                _chunk_from_meta(results["ids"][i], results["metadatas"][i], results["documents"][i])
+                for i in order
+            ]
+            
+        except Exception:
+            logger.exception("Error retrieving document chunks")
+            raise
 
-    def get_document_full_text(self, source_doc_id: str) -> Dict[str, Any]:
+    def get_document_full_text(self, source_doc_id: str) -> Optional[Dict[str, Any]]:
         """
-        Get the full text of a document by concatenating all chunks
+        Get the full text of a document by concatenating all chunks.
+        Returns None for an unknown document; errors are raised
         """
-        try:
-            chunks = self.get_document_chunks(source_doc_id)
-            
-            if not chunks:
-                return None
-            
-            # Concatenate all chunk texts in order
-            full_text = "\n\n".join([chunk["text"] for chunk in chunks])
-            
-            # Get metadata from first chunk
-            first_chunk = chunks[0]
-            
-            return {
-                "source_doc_id": source_doc_id,
-                "journal": first_chunk["journal"],
-                "publish_year": first_chunk["publish_year"],
-                "total_chunks": len(chunks),
-                "full_text": full_text,
-                "doi": first_chunk.get("doi"),
-                "link": first_chunk["link"]
-            }
-            
-        except Exception as e:
-            print(f"Error retrieving document full text: {str(e)}")
+        chunks = self.get_document_chunks(source_doc_id)
+        
+        if not chunks:
             return None
+        
+        # Concatenate all chunk texts in order
+        full_text = "\n\n".join([chunk["text"] for chunk in chunks])
+        
+        # Get metadata from first chunk
+        first_chunk = chunks[0]
+        
+        return {
+            "source_doc_id": source_doc_id,
+            "journal": first_chunk["journal"],
+            "publish_year": first_chunk["publish_year"],
+            "total_chunks": len(chunks),
+            "full_text": full_text,
+            "doi": first_chunk.get("doi"),
+            "link": first_chunk["link"]
+        }
     
     def get_collection_stats(self) -> Dict[str, Any]:
         """
@@ -216,6 +380,6 @@ class ChromaVectorStore:
                 "total_chunks": count,
                 "collection_name": self.collection_name
             }
-        except Exception as e:
-            print(f"Error getting collection stats: {str(e)}")
+        except Exception:
+            logger.exception("Error getting collection stats")
             return {"total_chunks": 0, "collection_name": self.collection_name} 
\ No newline at end of file